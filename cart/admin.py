@@ -2,9 +2,20 @@ from django.contrib import admin
 
 from . import models
 
+
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'user', 'ordered', 'ordered_date', 'delivery')
+    list_select_related = ('user', 'delivery')
+
+
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'order', 'colour', 'size')
+    list_select_related = ('order', 'product', 'colour', 'size')
+
+
 admin.site.register(models.Product)
-admin.site.register(models.Order)
-admin.site.register(models.OrderItem)
+admin.site.register(models.Order, OrderAdmin)
+admin.site.register(models.OrderItem, OrderItemAdmin)
 admin.site.register(models.ColourVariation)
 admin.site.register(models.SizeVariation)
 admin.site.register(models.Delivery)
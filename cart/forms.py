@@ -1,8 +1,13 @@
 from django import forms
-from .models import OrderItem, Product, ColourVariation, SizeVariation, Address, Order, Delivery
-from django.contrib.auth import get_user_model
+from .models import OrderItem, ColourVariation, SizeVariation, Address, Order, Delivery, get_delivery_options
 
-User = get_user_model()
+REQUIRED_FIELD_MESSAGE = 'Please fill in this field.'
+SHIPPING_FIELDS = ('Adres_zamieszkania1', 'Adres_zamieszkania2', 'shipping_zip_code', 'shipping_city')
+BILLING_FIELDS = ('billing_address_line1', 'billing_address_line2', 'billing_zip_code', 'billing_city')
+
+
+def prefetched_choices(field, objects):
+    return [('', field.empty_label)] + [(obj.pk, field.label_from_instance(obj)) for obj in objects]
 
 
 class AddToCartForm(forms.ModelForm):
@@ -15,21 +20,22 @@ class AddToCartForm(forms.ModelForm):
         fields = ['quantity', 'colour', 'size']
 
     def __init__(self, *args, **kwargs):
-        self.product_id = kwargs.pop('product_id')
-        product = Product.objects.get(id=self.product_id)
+        self.product = kwargs.pop('product')
         super().__init__(*args, **kwargs)
 
-        self.fields['colour'].queryset = product.available_colours.all()
-        self.fields['size'].queryset = product.available_sizes.all()
+        self.fields['colour'].queryset = self.product.available_colours.all()
+        self.fields['size'].queryset = self.product.available_sizes.all()
+        if hasattr(self.product, 'colours_list'):
+            self.fields['colour'].choices = prefetched_choices(self.fields['colour'], self.product.colours_list)
+        if hasattr(self.product, 'sizes_list'):
+            self.fields['size'].choices = prefetched_choices(self.fields['size'], self.product.sizes_list)
 
     def clean(self):
         cleaned_data = super().clean()
-        product_id = self.product_id
-        product = Product.objects.get(id=self.product_id)
         quantity = self.cleaned_data['quantity']
-        if product.stock < quantity:
+        if self.product.stock < quantity:
             raise forms.ValidationError(
-                f"Maksymalna dostępna ilość to: {product.stock}")
+                f"Maksymalna dostępna ilość to: {self.product.stock}")
         return cleaned_data
 
 
@@ -52,17 +58,11 @@ class AddressForm(forms.Form):
         user_id = kwargs.pop('user_id')
         super().__init__(*args, **kwargs)
 
-        user = User.objects.get(id=user_id)
-
-        shipping_address_qs = Address.objects.filter(
-            user=user,
-            address_type='S'
-        )
-
-        billing_address_qs = Address.objects.filter(
-            user=user,
-            address_type='B'
+        user_address_qs = Address.objects.filter(user_id=user_id).only(
+            'id', 'address_line_1', 'address_line_2', 'city', 'zip_code'
         )
+        shipping_address_qs = user_address_qs.filter(address_type='S')
+        billing_address_qs = user_address_qs.filter(address_type='B')
 
         self.fields['selected_shipping_address'].queryset = shipping_address_qs
         self.fields['selected_billing_address'].queryset = billing_address_qs
@@ -70,27 +70,15 @@ class AddressForm(forms.Form):
     def clean(self):
         data = self.cleaned_data
 
-        selected_shipping_address = data.get('selected_shipping_address', None)
-        if selected_shipping_address is None:
-            if not data.get('Adres_zamieszkania1', None):
-                self.add_error('Adres_zamieszkania1', 'Please fill in this field.')
-            if not data.get('Adres_zamieszkania2', None):
-                self.add_error('Adres_zamieszkania2', 'Please fill in this field.')
-            if not data.get('shipping_zip_code', None):
-                self.add_error('shipping_zip_code', 'Please fill in this field.')
-            if not data.get('shipping_city', None):
-                self.add_error('shipping_city', 'Please fill in this field.')
-
-        selected_billing_address = data.get('selected_billing_address', None)
-        if selected_billing_address is None:
-            if not data.get('billing_address_line1', None):
-                self.add_error('billing_address_line1', 'Please fill in this field.')
-            if not data.get('billing_address_line2', None):
-                self.add_error('billing_address_line2', 'Please fill in this field.')
-            if not data.get('billing_zip_code', None):
-                self.add_error('billing_zip_code', 'Please fill in this field.')
-            if not data.get('billing_city', None):
-                self.add_error('billing_city', 'Please fill in this field.')
+        if data.get('selected_shipping_address', None) is None:
+            for field in SHIPPING_FIELDS:
+                if not data.get(field, None):
+                    self.add_error(field, REQUIRED_FIELD_MESSAGE)
+
+        if data.get('selected_billing_address', None) is None:
+            for field in BILLING_FIELDS:
+                if not data.get(field, None):
+                    self.add_error(field, REQUIRED_FIELD_MESSAGE)
 
 
 class DeliveryForm(forms.ModelForm):
@@ -99,3 +87,7 @@ class DeliveryForm(forms.ModelForm):
     class Meta:
         model = Order
         fields = ['delivery', ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['delivery'].choices = prefetched_choices(self.fields['delivery'], get_delivery_options())
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-14 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_alter_delivery_options_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['user', 'address_type'], name='cart_addres_user_id_fd7719_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['active', 'primary_category'], name='cart_produc_active_c043b0_idx'),
+        ),
+    ]
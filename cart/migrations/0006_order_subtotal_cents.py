@@ -0,0 +1,30 @@
+# Generated by Django 4.2.2 on 2026-10-14 07:33
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_subtotal_cents(apps, schema_editor):
+    Order = apps.get_model('cart', 'Order')
+    OrderItem = apps.get_model('cart', 'OrderItem')
+    subtotals = OrderItem.objects.filter(order=OuterRef('pk')).values('order').annotate(
+        subtotal=Sum(F('quantity') * F('product__price'), output_field=models.IntegerField())
+    ).values('subtotal')
+    Order.objects.update(subtotal_cents=Coalesce(Subquery(subtotals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_address_cart_addres_user_id_fd7719_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='subtotal_cents',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_subtotal_cents, migrations.RunPython.noop),
+    ]
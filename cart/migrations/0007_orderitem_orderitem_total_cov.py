@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-14 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0006_order_subtotal_cents'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'product', 'quantity'], name='orderitem_total_cov'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.2 on 2026-10-14 07:40
+
+from django.db import migrations, models
+
+
+def amount_to_cents(apps, schema_editor):
+    Payment = apps.get_model('cart', 'Payment')
+    for payment in Payment.objects.all():
+        payment.amount_cents = round(payment.amount * 100)
+        payment.save(update_fields=['amount_cents'])
+
+
+def cents_to_amount(apps, schema_editor):
+    Payment = apps.get_model('cart', 'Payment')
+    for payment in Payment.objects.all():
+        payment.amount = payment.amount_cents / 100
+        payment.save(update_fields=['amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0007_orderitem_orderitem_total_cov'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='amount_cents',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(amount_to_cents, cents_to_amount),
+        migrations.AlterField(
+            model_name='payment',
+            name='amount',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='amount',
+        ),
+        migrations.RenameField(
+            model_name='payment',
+            old_name='amount_cents',
+            new_name='amount',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-14 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0008_payment_amount_cents'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('ordered', False)), fields=['user'], name='order_active_cart_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-ordered_date'], name='order_history_idx'),
+        ),
+    ]
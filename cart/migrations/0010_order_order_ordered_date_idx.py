@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-14 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0009_order_order_active_cart_idx_order_order_history_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['ordered', '-ordered_date'], name='order_ordered_date_idx'),
+        ),
+    ]
@@ -1,11 +1,32 @@
+import re
+import time
+from functools import cached_property
+
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Prefetch, Q
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth import get_user_model
-from django.db.models.signals import pre_save
 from django.utils.text import slugify
 from django.shortcuts import reverse
 
 User = get_user_model()
 
+PRODUCT_LIST_GENERATION_KEY = 'product_list_generation'
+CATEGORY_LIST_CACHE_KEY = 'all_categories'
+DELIVERY_CACHE_TIMEOUT = 300
+_DELIVERY_CACHE = {'ts': 0, 'items': None}
+
+_SLUG_STRIP_RE = re.compile(r'[^\w\s-]')
+_SLUG_HYPHENATE_RE = re.compile(r'[-\s]+')
+
+
+def slugify_title(title):
+    if not title.isascii():
+        return slugify(title)
+    value = _SLUG_STRIP_RE.sub('', title.lower())
+    return _SLUG_HYPHENATE_RE.sub('-', value).strip('-_')
+
 
 class ColourVariation(models.Model):
     name = models.CharField(max_length=50)
@@ -40,22 +61,56 @@ class Address(models.Model):
 
     class Meta:
         verbose_name_plural = 'Addresses'
+        indexes = [
+            models.Index(fields=['user', 'address_type']),
+        ]
 
 
 class Delivery(models.Model):
     type = models.CharField(max_length=60)
     cost = models.IntegerField(default=0)
 
-    def get_total(self):
+    @cached_property
+    def total_display(self):
         return '{:.2f}'.format(self.cost / 100)
 
+    def get_total(self):
+        return self.total_display
+
     def __str__(self):
-        return f'{self.type} - {self.get_total()} zł'
+        return f'{self.type} - {self.total_display} zł'
 
     class Meta:
         verbose_name_plural = 'Deliveries'
 
 
+def get_delivery_options():
+    now = time.monotonic()
+    if _DELIVERY_CACHE['items'] is None or now - _DELIVERY_CACHE['ts'] > DELIVERY_CACHE_TIMEOUT:
+        _DELIVERY_CACHE['items'] = list(Delivery.objects.all())
+        _DELIVERY_CACHE['ts'] = now
+    return _DELIVERY_CACHE['items']
+
+
+def clear_delivery_options():
+    _DELIVERY_CACHE['items'] = None
+
+
+def delivery_changed_receiver(sender, instance, *args, **kwargs):
+    clear_delivery_options()
+
+
+post_save.connect(delivery_changed_receiver, sender=Delivery)
+post_delete.connect(delivery_changed_receiver, sender=Delivery)
+
+
+class OrderManager(models.Manager):
+    def with_totals(self):
+        return self.get_queryset().select_related('delivery').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product', 'colour', 'size'))
+        )
+
+
 class Order(models.Model):
     user = models.ForeignKey(User, blank=True, null=True, on_delete=models.CASCADE)
     start_date = models.DateTimeField(auto_now_add=True)
@@ -66,32 +121,44 @@ class Order(models.Model):
     shipping_address = models.ForeignKey(Address, related_name='shipping_address', blank=True, null=True,
                                          on_delete=models.SET_NULL)
     delivery = models.ForeignKey('Delivery', blank=True, null=True, on_delete=models.CASCADE)
+    subtotal_cents = models.IntegerField(default=0)
+
+    objects = OrderManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user'], condition=Q(ordered=False), name='order_active_cart_idx'),
+            models.Index(fields=['user', '-ordered_date'], name='order_history_idx'),
+            models.Index(fields=['ordered', '-ordered_date'], name='order_ordered_date_idx'),
+        ]
 
     def __str__(self):
         return f"ORDER-{self.pk}"
 
-    def get_raw_subtotal(self):
+    @cached_property
+    def raw_subtotal(self):
+        if self.ordered:
+            return self.subtotal_cents
         total = 0
         for order_item in self.items.all():
             total += order_item.get_raw_total_item_price()
         return total
 
     def get_subtotal(self):
-        subtotal = self.get_raw_subtotal()
-        return '{:.2f}'.format(subtotal / 100)
+        return '{:.2f}'.format(self.raw_subtotal / 100)
 
     def get_raw_total(self):
         if self.delivery is None:
-            total = self.get_raw_subtotal()
+            total = self.raw_subtotal
         else:
-            total = self.get_raw_subtotal() + self.delivery.cost
+            total = self.raw_subtotal + self.delivery.cost
         return total
 
     def get_total(self):
         total = self.get_raw_total()
         return '{:.2f}'.format(total / 100)
 
-    @property
+    @cached_property
     def reference_number(self):
         return f"ORDER-{self.pk}"
 
@@ -103,15 +170,15 @@ class Payment(models.Model):
     ))
     timestamp = models.DateTimeField(auto_now_add=True)
     successful = models.BooleanField(default=False)
-    amount = models.FloatField()
+    amount = models.IntegerField(default=0)
     raw_response = models.TextField()
 
     def __str__(self):
         return self.reference_number
 
-    @property
+    @cached_property
     def reference_number(self):
-        return f"PAYMENT-{self.order}-{self.pk}"
+        return f"PAYMENT-ORDER-{self.order_id}-{self.pk}"
 
 
 class Product(models.Model):
@@ -129,15 +196,29 @@ class Product(models.Model):
     secondary_categories = models.ManyToManyField('Category', blank=True)
     stock = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['active', 'primary_category']),
+        ]
+
     def __str__(self):
         return self.title
 
     def __repr__(self):
         return f"<Product: {self.title}>"
 
-    def get_absolute_url(self):
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify_title(self.title)
+        super().save(*args, **kwargs)
+
+    @cached_property
+    def absolute_url(self):
         return reverse('cart:product-detail', kwargs={'slug': self.slug})
 
+    def get_absolute_url(self):
+        return self.absolute_url
+
     def get_price(self):
         return '{:.2f}'.format(self.price / 100)
 
@@ -151,13 +232,9 @@ class Product(models.Model):
     def in_stock(self):
         return self.stock > 0
 
-
-def pre_save_product_receiver(sender, instance, *args, **kwargs):
-    if not instance.slug:
-        instance.slug = slugify(instance.title)
-
-
-pre_save.connect(pre_save_product_receiver, sender=Product)
+    @cached_property
+    def image_url(self):
+        return self.image.url if self.image else ''
 
 
 class OrderItem(models.Model):
@@ -167,6 +244,11 @@ class OrderItem(models.Model):
     colour = models.ForeignKey(ColourVariation, on_delete=models.CASCADE)
     size = models.ForeignKey(SizeVariation, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'product', 'quantity'], name='orderitem_total_cov'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.title}"
 
@@ -185,3 +267,24 @@ class Category(models.Model):
 
     class Meta:
         verbose_name_plural = 'Categories'
+
+
+def product_list_changed_receiver(sender, instance, *args, **kwargs):
+    try:
+        cache.incr(PRODUCT_LIST_GENERATION_KEY)
+    except ValueError:
+        cache.set(PRODUCT_LIST_GENERATION_KEY, 1, None)
+
+
+post_save.connect(product_list_changed_receiver, sender=Product)
+post_delete.connect(product_list_changed_receiver, sender=Product)
+post_save.connect(product_list_changed_receiver, sender=Category)
+post_delete.connect(product_list_changed_receiver, sender=Category)
+
+
+def category_changed_receiver(sender, instance, *args, **kwargs):
+    cache.delete(CATEGORY_LIST_CACHE_KEY)
+
+
+post_save.connect(category_changed_receiver, sender=Category)
+post_delete.connect(category_changed_receiver, sender=Category)
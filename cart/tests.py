@@ -1,36 +1,36 @@
 import json
 
 from django.contrib.auth.models import User
-from django.core.files.uploadedfile import SimpleUploadedFile
-from django.shortcuts import get_object_or_404
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.text import slugify
 
 from .models import Product, Category, ColourVariation, SizeVariation, User, Order, OrderItem, Address, Payment, \
-    Delivery
+    Delivery, slugify_title, clear_delivery_options
+from core.testing import QueryCountTestMixin, make_image
 from .utils import get_or_set_order_session
 
 
-class ProductListViewTest(TestCase):
-    dummy_image = SimpleUploadedFile(
-        name='test_image.jpg',
-        content=open('media/test_image.jpg', 'rb').read(),
-        content_type='image/jpeg'
-    )
+class ProductListViewTest(QueryCountTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Test Category')
+        cls.product1, cls.product2 = Product.objects.bulk_create([
+            Product(title='Product 1', slug='product-1', image=make_image(), primary_category=cls.category,
+                    price=100, stock=10),
+            Product(title='Product 2', slug='product-2', image=make_image(), primary_category=cls.category,
+                    price=200, stock=5),
+        ])
 
     def setUp(self):
-        self.category = Category.objects.create(name='Test Category')
-        self.product1 = Product.objects.create(title='Product 1', slug='product-1', image=self.dummy_image,
-                                               primary_category=self.category, price=100, stock=10)
-        self.product2 = Product.objects.create(title='Product 2', slug='product-2', image=self.dummy_image,
-                                               primary_category=self.category, price=200, stock=5)
+        cache.clear()
 
-    def test_view_url_accessible_by_name(self):
+    def test_correct_url_and_template(self):
         response = self.client.get(reverse('cart:product-list'))
         self.assertEqual(response.status_code, 200)
-
-    def test_view_uses_correct_template(self):
-        response = self.client.get(reverse('cart:product-list'))
         self.assertTemplateUsed(response, 'cart/product_list.html')
 
     def test_view_context_contains_products(self):
@@ -38,9 +38,42 @@ class ProductListViewTest(TestCase):
         self.assertContains(response, self.product1.title)
         self.assertContains(response, self.product2.title)
 
+    def test_query_count_does_not_grow_with_products(self):
+        colour = ColourVariation.objects.create(name='red')
+        size = SizeVariation.objects.create(name='M')
+        self.product1.available_colours.add(colour)
+        self.product1.available_sizes.add(size)
+
+        def add_products():
+            products = Product.objects.bulk_create([
+                Product(title=f'Product {i}', slug=f'product-{i}', primary_category=self.category, price=100, stock=1)
+                for i in range(3, 6)
+            ])
+            colour.product_set.add(*products)
+            size.product_set.add(*products)
+
+        response = self.assertQueryCountDoesNotGrow(reverse('cart:product-list'), add_products, clear_cache=True)
+        self.assertContains(response, 'Product 5')
+
+    def test_product_list_is_served_from_cache(self):
+        url = reverse('cart:product-list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, self.product1.title)
+        self.assertFalse([q for q in queries if 'FROM "cart_product"' in q['sql']])
+
+    def test_product_save_invalidates_cached_list(self):
+        url = reverse('cart:product-list')
+        self.client.get(url)
+        self.product1.title = 'Renamed Product'
+        self.product1.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Renamed Product')
+
     def test_view_filters_products_by_category(self):
         category2 = Category.objects.create(name='Category 2')
-        product3 = Product.objects.create(title='Product 3', slug='product-3', image=self.dummy_image,
+        product3 = Product.objects.create(title='Product 3', slug='product-3', image=make_image(),
                                           primary_category=category2, price=300, stock=15)
         response = self.client.get(reverse('cart:product-list'), {'category': self.category.name})
         self.assertContains(response, self.product1.title)
@@ -49,37 +82,42 @@ class ProductListViewTest(TestCase):
 
     def test_view_context_contains_categories(self):
         response = self.client.get(reverse('cart:product-list'))
-        self.assertQuerysetEqual(response.context['categories'], Category.objects.all(), transform=lambda x: x)
+        self.assertEqual([category.pk for category in response.context['categories']],
+                         list(Category.objects.values_list('pk', flat=True)))
+
+    def test_category_save_invalidates_cached_categories(self):
+        url = reverse('cart:product-list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q for q in queries if 'FROM "cart_category"' in q['sql']])
+        Category.objects.create(name='New Category')
+        response = self.client.get(url)
+        self.assertIn('New Category', [c.name for c in response.context['categories']])
 
     def test_view_context_contains_no_products_when_empty_database(self):
         Product.objects.all().delete()
         response = self.client.get(reverse('cart:product-list'))
-        self.assertQuerysetEqual(response.context['object_list'], [])
+        self.assertFalse(response.context['object_list'])
 
 
 class ProductDetailViewTest(TestCase):
-    dummy_image = SimpleUploadedFile(
-        name='test_image.jpg',
-        content=open('media/test_image.jpg', 'rb').read(),
-        content_type='image/jpeg'
-    )
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Test Category')
+        cls.product = Product.objects.create(title='Test Product', slug='test-product', image=make_image(),
+                                             price=100, stock=10, primary_category=cls.category)
+        cls.url = reverse('cart:product-detail', kwargs={'slug': cls.product.slug})
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.order = Order.objects.create(user=cls.user)
 
     def setUp(self):
-        self.category = Category.objects.create(name='Test Category')
-        self.product = Product.objects.create(title='Test Product', slug='test-product', image=self.dummy_image,
-                                              price=100, stock=10, primary_category=self.category)
-        self.url = reverse('cart:product-detail', kwargs={'slug': self.product.slug})
         self.client = Client()
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
-        self.order = Order.objects.create(user=self.user)
-        self.client.login(username='testuser', password='testpassword')
+        self.client.force_login(self.user)
 
-    def test_view_url_accessible_by_name(self):
+    def test_correct_url_and_template(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-
-    def test_view_uses_correct_template(self):
-        response = self.client.get(self.url)
         self.assertTemplateUsed(response, 'cart/product_detail.html')
 
     def test_view_renders_correct_context(self):
@@ -110,6 +148,23 @@ class ProductDetailViewTest(TestCase):
         self.product.refresh_from_db()
         self.assertEqual(self.product.orderitem_set.count(), initial_item_count + 1)
 
+    def test_form_valid_does_not_reserve_stock(self):
+        colour_choice = ColourVariation.objects.create(name='Red')
+        size_choice = SizeVariation.objects.create(name='M')
+        self.product.available_colours.add(colour_choice)
+        self.product.available_sizes.add(size_choice)
+
+        data = {
+            'colour': colour_choice.id,
+            'size': size_choice.id,
+            'quantity': 3,
+        }
+
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+
     def test_form_invalid_with_quantity_greater_than_stock(self):
         colour_choice = ColourVariation.objects.create(name='Red')
         size_choice = SizeVariation.objects.create(name='M')
@@ -131,16 +186,16 @@ class ProductDetailViewTest(TestCase):
 
 
 class CartViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='testuser')
 
     def setUp(self):
         self.client = Client()
 
-    def test_view_url_accessible_by_name(self):
+    def test_correct_url_and_template(self):
         response = self.client.get(reverse('cart:summary'))
         self.assertEqual(response.status_code, 200)
-
-    def test_view_uses_correct_template(self):
-        response = self.client.get(reverse('cart:summary'))
         self.assertTemplateUsed(response, 'cart/cart.html')
 
     def test_cart_view_with_order(self):
@@ -148,20 +203,27 @@ class CartViewTest(TestCase):
         session = self.client.session
         session['order_id'] = order.id
         session.save()
-        user = User.objects.create(username='testuser')
-        self.client.force_login(user)
+        self.client.force_login(self.user)
         response = self.client.get(reverse('cart:summary'))
         self.assertEqual(response.status_code, 200)
         self.assertIn('order', response.context)
         self.assertEqual(response.context['order'], order)
 
     def test_get_or_set_order_session_with_authenticated_user(self):
-        user = User.objects.create(username='testuser')
-        self.client.force_login(user)
+        self.client.force_login(self.user)
         response = self.client.get(reverse('cart:summary'))
         request = response.wsgi_request
         order = get_or_set_order_session(request)
-        self.assertEqual(order.user, user)
+        self.assertEqual(order.user, self.user)
+
+    def test_get_or_set_order_session_reuses_existing_order(self):
+        self.client.force_login(self.user)
+        request = self.client.get(reverse('cart:summary')).wsgi_request
+        request.session.modified = False
+        with self.assertNumQueries(2):
+            order = get_or_set_order_session(request)
+        self.assertEqual(order.user_id, self.user.pk)
+        self.assertFalse(request.session.modified)
 
     def test_get_or_set_order_session_without_authenticated_user(self):
         request = self.client.get(reverse('cart:summary')).wsgi_request
@@ -179,25 +241,25 @@ class CartViewTest(TestCase):
 
 
 class IncreaseQuantityViewTest(TestCase):
-    dummy_image = SimpleUploadedFile(
-        name='test_image.jpg',
-        content=open('media/test_image.jpg', 'rb').read(),
-        content_type='image/jpeg'
-    )
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.category = Category.objects.create(name='Test Category')
+        cls.colour = ColourVariation.objects.create(name='red')
+        cls.size = SizeVariation.objects.create(name='M')
+        cls.order = Order(user=cls.user)
+        cls.order.save()
+        cls.product = Product.objects.create(title='Product 1', slug='product-1', image=make_image(),
+                                             primary_category=cls.category, price=100, stock=10)
+        cls.order_item = OrderItem.objects.create(order=cls.order, product=cls.product, colour=cls.colour,
+                                                  size=cls.size, quantity=2)
+        cls.url = reverse('cart:increase-quantity', kwargs={'pk': cls.order_item.pk})
 
     def setUp(self):
         self.client = Client()
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
-        self.category = Category.objects.create(name='Test Category')
-        self.colour = ColourVariation.objects.create(name='red')
-        self.size = SizeVariation.objects.create(name='M')
-        self.order = Order(user=self.user)
-        self.order.save()
-        self.product = Product.objects.create(title='Product 1', slug='product-1', image=self.dummy_image,
-                                              primary_category=self.category, price=100, stock=10)
-        self.order_item = OrderItem.objects.create(order=self.order, product=self.product, colour=self.colour,
-                                                   size=self.size, quantity=2)
-        self.url = reverse('cart:increase-quantity', kwargs={'pk': self.order_item.pk})
+        session = self.client.session
+        session['order_id'] = self.order.id
+        session.save()
 
     def test_view_url_accessible_by_name(self):
         response = self.client.get(self.url)
@@ -212,46 +274,58 @@ class IncreaseQuantityViewTest(TestCase):
         response = self.client.get(reverse('cart:increase-quantity', kwargs={'pk': self.order_item.pk}))
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, reverse('cart:summary'))
-        updated_order_item = get_object_or_404(OrderItem, pk=self.order_item.pk)
+        updated_order_item = OrderItem.objects.only('quantity').get(pk=self.order_item.pk)
         self.assertEqual(updated_order_item.quantity, self.order_item.quantity + 1)
 
+    def test_increase_quantity_view_stops_at_stock(self):
+        OrderItem.objects.filter(pk=self.order_item.pk).update(quantity=self.product.stock)
+        self.client.get(self.url)
+        updated_order_item = OrderItem.objects.only('quantity').get(pk=self.order_item.pk)
+        self.assertEqual(updated_order_item.quantity, self.product.stock)
+
+    def test_increase_quantity_view_rejects_item_from_another_cart(self):
+        response = Client().get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_increase_quantity_view_rejects_ordered_item(self):
+        Order.objects.filter(pk=self.order.pk).update(ordered=True)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
 
 class DecreaseQualityViewTest(TestCase):
-    dummy_image = SimpleUploadedFile(
-        name='test_image.jpg',
-        content=open('media/test_image.jpg', 'rb').read(),
-        content_type='image/jpeg'
-    )
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.category = Category.objects.create(name='Test Category')
+        cls.colour = ColourVariation.objects.create(name='red')
+        cls.size = SizeVariation.objects.create(name='M')
+        cls.order = Order(user=cls.user)
+        cls.order.save()
+        cls.product = Product.objects.create(title='Product 1', slug='product-1', image=make_image(),
+                                             primary_category=cls.category, price=100, stock=10)
+        cls.order_item = OrderItem.objects.create(order=cls.order, product=cls.product, colour=cls.colour,
+                                                  size=cls.size, quantity=2)
 
     def setUp(self):
         self.client = Client()
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
-        self.category = Category.objects.create(name='Test Category')
-        self.colour = ColourVariation.objects.create(name='red')
-        self.size = SizeVariation.objects.create(name='M')
-        self.order = Order(user=self.user)
-        self.order.save()
-        self.product = Product.objects.create(title='Product 1', slug='product-1', image=self.dummy_image,
-                                              primary_category=self.category, price=100, stock=10)
-        self.order_item = OrderItem.objects.create(order=self.order, product=self.product, colour=self.colour,
-                                                   size=self.size, quantity=2)
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['order_id'] = self.order.id
+        session.save()
 
     def test_decrease_quantity_view(self):
         order_item = OrderItem.objects.create(order=self.order, product=self.product, colour=self.colour,
                                               size=self.size, quantity=2)
-        order_item.save()
-        self.client.force_login(self.user)
         response = self.client.get(reverse('cart:decrease-quantity', kwargs={'pk': order_item.pk}))
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, reverse('cart:summary'))
-        updated_order_item = get_object_or_404(OrderItem, pk=order_item.pk)
+        updated_order_item = OrderItem.objects.only('quantity').get(pk=order_item.pk)
         self.assertEqual(updated_order_item.quantity, order_item.quantity - 1)
 
     def test_delete_item_when_its_quantity_is_0(self):
         order_item = OrderItem.objects.create(order=self.order, product=self.product, colour=self.colour,
                                               size=self.size, quantity=1)
-        order_item.save()
-        self.client.force_login(self.user)
         initial_order_item_count = OrderItem.objects.count()
         response = self.client.get(reverse('cart:decrease-quantity', kwargs={'pk': order_item.pk}))
         self.assertEqual(response.status_code, 302)
@@ -261,33 +335,32 @@ class DecreaseQualityViewTest(TestCase):
 
 
 class RemoveFromCartViewTest(TestCase):
-    dummy_image = SimpleUploadedFile(
-        name='test_image.jpg',
-        content=open('media/test_image.jpg', 'rb').read(),
-        content_type='image/jpeg'
-    )
-
     def test_valid_url(self):
         response = self.client.get(reverse('cart:remove-from-cart', kwargs={'pk': self.order_item.pk}))
         self.assertEqual(response.status_code, 302)
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.category = Category.objects.create(name='Test Category')
+        cls.colour = ColourVariation.objects.create(name='red')
+        cls.size = SizeVariation.objects.create(name='M')
+        cls.order = Order(user=cls.user)
+        cls.order.save()
+        cls.product = Product.objects.create(title='Product 1', slug='product-1', image=make_image(),
+                                             primary_category=cls.category, price=100, stock=10)
+        cls.order_item = OrderItem.objects.create(order=cls.order, product=cls.product, colour=cls.colour,
+                                                  size=cls.size, quantity=2)
+
     def setUp(self):
         self.client = Client()
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
-        self.category = Category.objects.create(name='Test Category')
-        self.colour = ColourVariation.objects.create(name='red')
-        self.size = SizeVariation.objects.create(name='M')
-        self.order = Order(user=self.user)
-        self.order.save()
-        self.product = Product.objects.create(title='Product 1', slug='product-1', image=self.dummy_image,
-                                              primary_category=self.category, price=100, stock=10)
-        self.order_item = OrderItem.objects.create(order=self.order, product=self.product, colour=self.colour,
-                                                   size=self.size, quantity=2)
+        session = self.client.session
+        session['order_id'] = self.order.id
+        session.save()
 
     def test_remove_from_cart_view(self):
         order_item = OrderItem.objects.create(order=self.order, product=self.product, colour=self.colour,
                                               size=self.size, quantity=2)
-        order_item.save()
         initial_order_item_count = OrderItem.objects.count()
         response = self.client.get(reverse('cart:remove-from-cart', kwargs={'pk': order_item.pk}))
         self.assertEqual(response.status_code, 302)
@@ -295,14 +368,18 @@ class RemoveFromCartViewTest(TestCase):
         updated_order_item_count = OrderItem.objects.count()
         self.assertEqual(updated_order_item_count, initial_order_item_count - 1)
 
+    def test_remove_from_cart_view_rejects_item_from_another_cart(self):
+        response = Client().get(reverse('cart:remove-from-cart', kwargs={'pk': self.order_item.pk}))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(OrderItem.objects.filter(pk=self.order_item.pk).exists())
+
 
 class CheckoutViewTest(TestCase):
 
-    def setUp(self):
-        self.client = Client()
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
-        self.client.force_login(self.user)
-        self.address_data = {
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.address_data = {
             'Adres_zamieszkania1': 'Test Address 1',
             'Adres_zamieszkania2': 'Test Address 2',
             'shipping_zip_code': '12345',
@@ -313,6 +390,17 @@ class CheckoutViewTest(TestCase):
             'billing_city': 'Test Billing City',
         }
 
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_order(self):
+        return Order.objects.select_related('shipping_address', 'billing_address').only(
+            'shipping_address__address_line_1', 'shipping_address__address_line_2', 'shipping_address__zip_code',
+            'shipping_address__city', 'billing_address__address_line_1', 'billing_address__address_line_2',
+            'billing_address__zip_code', 'billing_address__city',
+        ).get(user=self.user)
+
     def test_correct_url_and_template(self):
         response = self.client.get(reverse('cart:checkout'))
         self.assertEqual(response.status_code, 200)
@@ -328,21 +416,19 @@ class CheckoutViewTest(TestCase):
             address_type='S',
         )
 
-        self.client.force_login(self.user)
         form_data = self.address_data.copy()
         form_data['selected_shipping_address'] = shipping_address.pk
         response = self.client.post(reverse('cart:checkout'), data=form_data)
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('cart:payment'))
-        order = Order.objects.get(user=self.user)
+        order = self.get_order()
         self.assertEqual(order.shipping_address, shipping_address)
 
     def test_checkout_view_with_new_shipping_address(self):
-        self.client.force_login(self.user)
         response = self.client.post(reverse('cart:checkout'), data=self.address_data)
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('cart:payment'))
-        order = Order.objects.get(user=self.user)
+        order = self.get_order()
         self.assertEqual(order.shipping_address.address_line_1, self.address_data['Adres_zamieszkania1'])
         self.assertEqual(order.shipping_address.address_line_2, self.address_data['Adres_zamieszkania2'])
         self.assertEqual(order.shipping_address.zip_code, self.address_data['shipping_zip_code'])
@@ -358,28 +444,25 @@ class CheckoutViewTest(TestCase):
             address_type='B',
         )
 
-        self.client.force_login(self.user)
         form_data = self.address_data.copy()
         form_data['selected_billing_address'] = billing_address.pk
         response = self.client.post(reverse('cart:checkout'), data=form_data)
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('cart:payment'))
-        order = Order.objects.get(user=self.user)
+        order = self.get_order()
         self.assertEqual(order.billing_address, billing_address)
 
     def test_checkout_view_with_new_billing_address(self):
-        self.client.force_login(self.user)
         response = self.client.post(reverse('cart:checkout'), data=self.address_data)
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('cart:payment'))
-        order = Order.objects.get(user=self.user)
+        order = self.get_order()
         self.assertEqual(order.billing_address.address_line_1, self.address_data['billing_address_line1'])
         self.assertEqual(order.billing_address.address_line_2, self.address_data['billing_address_line2'])
         self.assertEqual(order.billing_address.zip_code, self.address_data['billing_zip_code'])
         self.assertEqual(order.billing_address.city, self.address_data['billing_city'])
 
     def test_checkout_view_with_invalid_form_data(self):
-        self.client.force_login(self.user)
         form_data = {}
         response = self.client.post(reverse('cart:checkout'), data=form_data)
         self.assertEqual(response.status_code, 200)
@@ -389,18 +472,51 @@ class CheckoutViewTest(TestCase):
 
 
 class PaymentViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Test Category')
+        cls.product = Product.objects.create(title='Product 1', slug='product-1', primary_category=cls.category,
+                                             price=150, stock=1)
+        cls.colour = ColourVariation.objects.create(name='red')
+        cls.size = SizeVariation.objects.create(name='M')
 
     def test_view_accessible_template(self):
         response = self.client.get(reverse('cart:payment'))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'cart/payment.html')
 
+    def test_view_redirects_to_cart_when_stock_ran_out(self):
+        self.client.get(reverse('cart:summary'))
+        order = Order.objects.get(id=self.client.session.get('order_id'))
+        OrderItem.objects.create(order=order, product=self.product, colour=self.colour, size=self.size, quantity=2)
+        response = self.client.get(reverse('cart:payment'))
+        self.assertRedirects(response, reverse('cart:summary'))
+
 
 class ConfirmOrderViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Test Category')
+        cls.product = Product.objects.create(title='Product 1', slug='product-1', primary_category=cls.category,
+                                             price=150, stock=10)
+        cls.colour = ColourVariation.objects.create(name='red')
+        cls.size = SizeVariation.objects.create(name='M')
+
     def setUp(self):
         self.client = Client()
         self.url = reverse('cart:confirm-order')
 
+    def create_cart_item(self, quantity=2):
+        self.client.get(reverse('cart:summary'))
+        order = Order.objects.get(id=self.client.session.get('order_id'))
+        OrderItem.objects.create(order=order, product=self.product, colour=self.colour, size=self.size,
+                                 quantity=quantity)
+        return order
+
+    def confirm(self, value):
+        payment_data = {"purchase_units": [{"amount": {"value": value}}]}
+        return self.client.post(self.url, data=json.dumps(payment_data), content_type='application/json')
+
     def test_confirm_order_success(self):
         payment_data = {
             "purchase_units": [
@@ -418,7 +534,7 @@ class ConfirmOrderViewTest(TestCase):
         order = Order.objects.get(id=self.client.session.get('order_id'))
         payment = Payment.objects.get(order=order)
         self.assertTrue(payment.successful)
-        self.assertEqual(payment.amount, 100.00)
+        self.assertEqual(payment.amount, 10000)
         self.assertEqual(payment.payment_method, 'paypal')
         self.assertEqual(payment.raw_response, json.dumps(payment_data))
         order.refresh_from_db()
@@ -427,6 +543,35 @@ class ConfirmOrderViewTest(TestCase):
         reference_number_expected = f"PAYMENT-{order}-{payment.id}"
         self.assertEqual(payment.reference_number, reference_number_expected)
 
+    def test_confirm_order_stores_subtotal(self):
+        order = self.create_cart_item()
+        self.confirm("3.00")
+        order.refresh_from_db()
+        self.assertEqual(order.subtotal_cents, 300)
+
+    def test_confirm_order_reserves_stock(self):
+        self.create_cart_item()
+        self.confirm("3.00")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_confirm_order_out_of_stock(self):
+        order = self.create_cart_item(quantity=11)
+        with self.assertLogs('cart.views', level='ERROR'):
+            response = self.confirm("16.50")
+        self.assertEqual(response.status_code, 409)
+        order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertFalse(order.ordered)
+        self.assertEqual(self.product.stock, 10)
+        self.assertFalse(Payment.objects.get(order=order).successful)
+
+    def test_confirm_order_query_count(self):
+        self.client.get(reverse('cart:summary'))
+        with self.assertNumQueries(8):
+            response = self.confirm("100.00")
+        self.assertEqual(response.json(), {"data": "Success"})
+
 
 class ThankYouViewTest(TestCase):
 
@@ -436,14 +581,17 @@ class ThankYouViewTest(TestCase):
         self.assertTemplateUsed('cart/thank-you.html')
 
 
-class OrderDetailViewTest(TestCase):
+class OrderDetailViewTest(QueryCountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.order = Order(user=cls.user)
+        cls.order.save()
+        cls.url = reverse('cart:order-detail', kwargs={'pk': cls.order.pk})
 
     def setUp(self):
         self.client = Client()
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
-        self.order = Order(user=self.user)
-        self.order.save()
-        self.url = reverse('cart:order-detail', kwargs={'pk': self.order.pk})
 
     def test_order_detail_view_unauthenticated_user(self):
         response = self.client.get(self.url)
@@ -456,12 +604,75 @@ class OrderDetailViewTest(TestCase):
         self.assertTemplateUsed(response, 'cart/order.html')
         self.assertEqual(response.context['order'], self.order)
 
+    def test_query_count_does_not_grow_with_items(self):
+        category = Category.objects.create(name='Test Category')
+        colour = ColourVariation.objects.create(name='red')
+        size = SizeVariation.objects.create(name='M')
+        products = [Product.objects.create(title=f'Product {i}', slug=f'product-{i}', primary_category=category,
+                                           price=100, stock=10) for i in range(3)]
+        OrderItem.objects.create(order=self.order, product=products[0], colour=colour, size=size)
+        self.client.force_login(self.user)
+
+        def add_items():
+            for product in products[1:]:
+                OrderItem.objects.create(order=self.order, product=product, colour=colour, size=size)
+
+        response = self.assertQueryCountDoesNotGrow(self.url, add_items)
+        self.assertEqual(len(response.context['order'].items.all()), 3)
+
+
+class ProductSlugTest(TestCase):
+
+    def test_slugify_title_matches_slugify(self):
+        for title in ["Men's T-Shirt", '  Koszulka  -- XL_ ', 'Żółta koszulka', 'Hello, World!']:
+            self.assertEqual(slugify_title(title), slugify(title))
+
+    def test_slug_generated_on_save(self):
+        category = Category.objects.create(name='Test Category')
+        product = Product.objects.create(title='New Product', primary_category=category)
+        self.assertEqual(product.slug, 'new-product')
+
+
+class OrderSubtotalTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Test Category')
+        cls.colour = ColourVariation.objects.create(name='red')
+        cls.size = SizeVariation.objects.create(name='M')
+        cls.product = Product.objects.create(title='Product 1', slug='product-1', primary_category=cls.category,
+                                             price=100, stock=10)
+        cls.order = Order.objects.create()
+
+    def test_order_item_changes_do_not_rewrite_stored_subtotal(self):
+        order_item = OrderItem.objects.create(order=self.order, product=self.product, colour=self.colour,
+                                              size=self.size, quantity=2)
+        Order.objects.filter(pk=self.order.pk).update(ordered=True, subtotal_cents=200)
+        Product.objects.filter(pk=self.product.pk).update(price=500)
+        order_item.quantity = 3
+        order_item.save()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal_cents, 200)
+
+    def test_ordered_order_uses_stored_subtotal(self):
+        OrderItem.objects.create(order=self.order, product=self.product, colour=self.colour,
+                                 size=self.size, quantity=2)
+        Order.objects.filter(pk=self.order.pk).update(ordered=True, subtotal_cents=200)
+        Product.objects.filter(pk=self.product.pk).update(price=500)
+        order = Order.objects.get(pk=self.order.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(order.get_subtotal(), '2.00')
+
 
 class DeliveryViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.delivery = Delivery.objects.create(type='Standard', cost=500)
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+
     def setUp(self):
+        clear_delivery_options()
         self.client = Client()
-        self.delivery = Delivery.objects.create(type='Standard', cost=500)
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
         self.client.force_login(self.user)
 
     def test_delivery_view(self):
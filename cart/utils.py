@@ -1,24 +1,59 @@
-from .models import Order
+import hashlib
+
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+
+from .models import Order, OrderItem, Category, PRODUCT_LIST_GENERATION_KEY, CATEGORY_LIST_CACHE_KEY
+
+PRODUCT_LIST_CACHE_TIMEOUT = 60
+CATEGORY_LIST_CACHE_TIMEOUT = 60
 
 
 def get_or_set_order_session(request):
     order_id = request.session.get('order_id', None)
+    user = request.user if request.user.is_authenticated else None
 
-    if order_id is None:
-        order = Order()
-        order.save()
-        request.session['order_id'] = order.id
-
-    else:
+    order = None
+    if order_id is not None:
         try:
-            order = Order.objects.get(id=order_id, ordered=False)
+            order = Order.objects.with_totals().get(id=order_id, ordered=False)
         except Order.DoesNotExist:
-            order = Order()
-            order.save()
-            request.session['order_id'] = order.id
+            pass
+
+    if order is None:
+        order = Order.objects.create(user=user)
+        request.session['order_id'] = order.id
 
-    if request.user.is_authenticated and order.user is None:
-        order.user = request.user
-        order.save()
+    elif user is not None and order.user_id is None:
+        order.user = user
+        order.save(update_fields=['user'])
 
     return order
+
+
+def get_cart_item_or_404(request, pk):
+    return get_object_or_404(
+        OrderItem.objects.only('quantity', 'order_id', 'product_id'),
+        id=pk,
+        order_id=request.session.get('order_id'),
+        order__ordered=False,
+    )
+
+
+def get_cached_product_list(queryset, category):
+    generation = cache.get_or_set(PRODUCT_LIST_GENERATION_KEY, 0, None)
+    key = f"product_list:{generation}:{hashlib.md5(category.encode()).hexdigest()}"
+    products = cache.get(key)
+    if products is None:
+        products = list(queryset)
+        cache.set(key, products, PRODUCT_LIST_CACHE_TIMEOUT)
+    return products
+
+
+def get_cached_categories():
+    categories = cache.get(CATEGORY_LIST_CACHE_KEY)
+    if categories is None:
+        categories = list(Category.objects.all())
+        cache.set(CATEGORY_LIST_CACHE_KEY, categories, CATEGORY_LIST_CACHE_TIMEOUT)
+    return categories
+
@@ -1,34 +1,40 @@
-import datetime
 import json
+import logging
+from decimal import Decimal
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Prefetch, Q
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, reverse, redirect
 from django.utils import timezone
 from django.views import generic
 
 from cart.forms import AddToCartForm, AddressForm, DeliveryForm
-from cart.models import Product, OrderItem, Address, Payment, Order, Category
-from cart.utils import get_or_set_order_session
+from cart.models import Product, Address, Payment, Order
+from cart.utils import get_or_set_order_session, get_cart_item_or_404, get_cached_product_list, get_cached_categories
+
+logger = logging.getLogger(__name__)
 
 
 class ProductListView(generic.ListView):
     template_name = 'cart/product_list.html'
+    context_object_name = 'product_list'
 
     def get_queryset(self):
-        qs = Product.objects.all()
-        category = self.request.GET.get('category', None)
+        qs = Product.objects.filter(active=True).defer('description').select_related(
+            'primary_category').prefetch_related('available_colours', 'available_sizes')
+        category = self.request.GET.get('category', '')
         if category:
             qs = qs.filter(Q(primary_category__name=category) | Q(secondary_categories__name=category)).distinct()
-        return qs
+        return get_cached_product_list(qs, category)
 
     def get_context_data(self, **kwargs):
         context = super(ProductListView, self).get_context_data(**kwargs)
         context.update({
-            'categories': Category.objects.all()
+            'categories': get_cached_categories()
         })
         return context
 
@@ -37,15 +43,23 @@ class ProductDetailView(generic.FormView):
     template_name = 'cart/product_detail.html'
     form_class = AddToCartForm
 
+    def get_queryset(self):
+        return Product.objects.prefetch_related(
+            Prefetch('available_colours', to_attr='colours_list'),
+            Prefetch('available_sizes', to_attr='sizes_list'),
+        )
+
     def get_object(self):
-        return get_object_or_404(Product, slug=self.kwargs["slug"])
+        if not hasattr(self, 'object'):
+            self.object = get_object_or_404(self.get_queryset(), slug=self.kwargs["slug"])
+        return self.object
 
     def get_success_url(self):
         return reverse("cart:summary")
 
     def get_form_kwargs(self):
         kwargs = super(ProductDetailView, self).get_form_kwargs()
-        kwargs["product_id"] = self.get_object().id
+        kwargs["product"] = self.get_object()
         return kwargs
 
     def form_valid(self, form):
@@ -87,18 +101,21 @@ class CartView(generic.TemplateView):
 
 class IncreaseQuantityView(generic.View):
     def get(self, request, *args, **kwargs):
-        order_item = get_object_or_404(OrderItem, id=kwargs['pk'])
-        order_item.quantity += 1
-        order_item.save()
+        order_item = get_cart_item_or_404(request, kwargs['pk'])
+        if Product.objects.filter(pk=order_item.product_id, stock__gt=order_item.quantity).exists():
+            order_item.quantity += 1
+            order_item.save(update_fields=['quantity'])
+        else:
+            messages.info(request, 'Brak większej ilości produktu w magazynie')
         return redirect('cart:summary')
 
 
 class DecreaseQuantityView(generic.View):
     def get(self, request, *args, **kwargs):
-        order_item = get_object_or_404(OrderItem, id=kwargs['pk'])
+        order_item = get_cart_item_or_404(request, kwargs['pk'])
         if order_item.quantity > 1:
             order_item.quantity -= 1
-            order_item.save()
+            order_item.save(update_fields=['quantity'])
         else:
             order_item.delete()
         return redirect('cart:summary')
@@ -106,7 +123,7 @@ class DecreaseQuantityView(generic.View):
 
 class RemoveFromCartView(generic.View):
     def get(self, request, *args, **kwargs):
-        order_item = get_object_or_404(OrderItem, id=kwargs['pk'])
+        order_item = get_cart_item_or_404(request, kwargs['pk'])
         order_item.delete()
         return redirect('cart:summary')
 
@@ -151,7 +168,7 @@ class CheckoutView(LoginRequiredMixin, generic.FormView):
             )
             order.billing_address = address
 
-        order.save()
+        order.save(update_fields=['shipping_address', 'billing_address'])
 
         messages.info(self.request, 'Adres dodany poprawnie')
         return super(CheckoutView, self).form_valid(form)
@@ -170,30 +187,53 @@ class CheckoutView(LoginRequiredMixin, generic.FormView):
 class PaymentView(generic.TemplateView):
     template_name = 'cart/payment.html'
 
+    def get(self, request, *args, **kwargs):
+        self.order = get_or_set_order_session(request)
+        if any(item.quantity > item.product.stock for item in self.order.items.all()):
+            messages.info(request, 'Brak wystarczającej ilości produktu w magazynie')
+            return redirect('cart:summary')
+        return super(PaymentView, self).get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super(PaymentView, self).get_context_data(**kwargs)
         context['PAYPAL_CLIENT_ID'] = settings.PAYPAL_CLIENT_ID
-        context['order'] = get_or_set_order_session(self.request)
+        context['order'] = self.order
         context['CALLBACK_URL'] = reverse('cart:thank-you')
         print(self.request.build_absolute_uri(reverse('cart:thank-you')))
         return context
 
 
 class ConfirmOrderView(generic.View):
+    def reserve_stock(self, order):
+        with transaction.atomic():
+            for item in order.items.all():
+                reserved = Product.objects.filter(pk=item.product_id, stock__gte=item.quantity).update(
+                    stock=F('stock') - item.quantity)
+                if not reserved:
+                    transaction.set_rollback(True)
+                    return False
+        return True
+
     def post(self, request, *args, **kwargs):
         order = get_or_set_order_session(request)
         body = json.loads(request.body)
-        payment = Payment.objects.create(
-            order=order,
-            successful=True,
-            raw_response=json.dumps(body),
-            amount=float(body['purchase_units'][0]['amount']["value"]),
-            payment_method='paypal',
-        )
-
-        order.ordered = True
-        order.ordered_date = datetime.datetime.now(tz=timezone.utc)
-        order.save()
+        with transaction.atomic():
+            in_stock = self.reserve_stock(order)
+            Payment.objects.create(
+                order=order,
+                successful=in_stock,
+                raw_response=json.dumps(body),
+                amount=int(Decimal(body['purchase_units'][0]['amount']["value"]) * 100),
+                payment_method='paypal',
+            )
+            if not in_stock:
+                logger.error('Payment for order %s was captured but stock ran out; it needs a refund', order.pk)
+                return JsonResponse({"data": "Out of stock"}, status=409)
+
+            order.subtotal_cents = order.raw_subtotal
+            order.ordered = True
+            order.ordered_date = timezone.now()
+            order.save(update_fields=['subtotal_cents', 'ordered', 'ordered_date'])
         return JsonResponse({"data": "Success"})
 
 
@@ -204,7 +244,7 @@ class ThankYouView(generic.TemplateView):
 class OrderDetailView(LoginRequiredMixin, generic.DetailView):
     template_name = 'cart/order.html'
 
-    queryset = Order.objects.all()
+    queryset = Order.objects.with_totals().select_related('user', 'billing_address', 'shipping_address')
     context_object_name = 'order'
 
 
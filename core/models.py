@@ -1,2 +1,20 @@
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 
+from cart.models import Order
+
+PROFILE_ORDERS_CACHE_TIMEOUT = 300
+
+
+def profile_orders_cache_key(user_id):
+    return f'profile_orders:{user_id}'
+
+
+def profile_orders_changed_receiver(sender, instance, *args, **kwargs):
+    if instance.ordered and instance.user_id is not None:
+        cache.delete(profile_orders_cache_key(instance.user_id))
+
+
+post_save.connect(profile_orders_changed_receiver, sender=Order)
+post_delete.connect(profile_orders_changed_receiver, sender=Order)
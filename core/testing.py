@@ -0,0 +1,31 @@
+import os
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@lru_cache(maxsize=None)
+def _read_image(name):
+    with open(os.path.join('media', name), 'rb') as f:
+        return f.read()
+
+
+def make_image(name='test_image.jpg'):
+    return ContentFile(_read_image(name), name=name)
+
+
+class QueryCountTestMixin:
+    def assertQueryCountDoesNotGrow(self, url, grow, clear_cache=False):
+        self.client.get(url)
+        if clear_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        grow()
+        if clear_cache:
+            cache.clear()
+        with self.assertNumQueries(len(queries)):
+            return self.client.get(url)
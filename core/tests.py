@@ -1,10 +1,13 @@
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core import mail
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
 
-from cart.models import Order
+from cart.models import Order, OrderItem, Product, Category, ColourVariation, SizeVariation
+from core.models import profile_orders_cache_key
+from core.testing import QueryCountTestMixin
 
 
 class HomeViewTest(TestCase):
@@ -50,14 +53,26 @@ class ContactViewTest(TestCase):
         self.assertEqual(len(mail.outbox), 0)
 
 
-class ProfileViewTest(TestCase):
+class ProfileViewTest(QueryCountTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.category = Category.objects.create(name='Test Category')
+        cls.product = Product.objects.create(title='Product 1', primary_category=cls.category, price=100, stock=10)
+        cls.colour = ColourVariation.objects.create(name='red')
+        cls.size = SizeVariation.objects.create(name='M')
+
+    def create_order(self):
+        order = Order.objects.create(user=self.user, ordered=True)
+        OrderItem.objects.create(order=order, product=self.product, colour=self.colour, size=self.size)
+        return order
+
     def setUp(self):
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
         self.client = Client()
-        self.url = self.client.get(reverse('profile'))
+        cache.clear()
 
     def test_context_update_with_orders(self):
-        self.client.login(username='testuser', password='testpassword')
+        self.client.force_login(self.user)
         order = Order.objects.create(user=self.user, ordered=True)
         url = reverse('profile')
         response = self.client.get(url)
@@ -68,7 +83,7 @@ class ProfileViewTest(TestCase):
         self.assertEqual(list(orders_in_context), [order])
 
     def test_context_update_without_orders(self):
-        self.client.login(username='testuser', password='testpassword')
+        self.client.force_login(self.user)
         url = reverse('profile')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
@@ -76,3 +91,36 @@ class ProfileViewTest(TestCase):
         self.assertIn('orders', response.context)
         orders_in_context = response.context['orders']
         self.assertEqual(list(orders_in_context), [])
+
+    def test_profile_orders_are_served_from_cache(self):
+        self.client.force_login(self.user)
+        url = reverse('profile')
+        self.client.get(url)
+        Order.objects.bulk_create([Order(user=self.user, ordered=True)])
+        response = self.client.get(url)
+        self.assertEqual(list(response.context['orders']), [])
+
+    def test_order_save_invalidates_cached_orders(self):
+        self.client.force_login(self.user)
+        url = reverse('profile')
+        self.client.get(url)
+        order = self.create_order()
+        response = self.client.get(url)
+        self.assertEqual(list(response.context['orders']), [order])
+
+    def test_cart_save_keeps_cached_orders(self):
+        key = profile_orders_cache_key(self.user.id)
+        cache.set(key, [])
+        Order.objects.create(user=self.user)
+        self.assertEqual(cache.get(key), [])
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.client.force_login(self.user)
+        self.create_order()
+
+        def add_orders():
+            self.create_order()
+            self.create_order()
+
+        response = self.assertQueryCountDoesNotGrow(reverse('profile'), add_orders, clear_cache=True)
+        self.assertEqual(len(response.context['orders']), 3)
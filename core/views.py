@@ -1,12 +1,14 @@
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.urls import reverse
 from django.views import generic
 
 from cart.models import Order
 from .forms import ContactForm
+from .models import PROFILE_ORDERS_CACHE_TIMEOUT, profile_orders_cache_key
 
 
 class HomeView(generic.TemplateView):
@@ -44,7 +46,14 @@ class ProfileView(LoginRequiredMixin, generic.TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(ProfileView, self).get_context_data(**kwargs)
+        key = profile_orders_cache_key(self.request.user.id)
+        orders = cache.get(key)
+        if orders is None:
+            orders = list(Order.objects.with_totals().select_related(
+                'user', 'billing_address', 'shipping_address'
+            ).filter(user=self.request.user, ordered=True).order_by('-ordered_date'))
+            cache.set(key, orders, PROFILE_ORDERS_CACHE_TIMEOUT)
         context.update({
-            'orders': Order.objects.filter(user=self.request.user, ordered=True)
+            'orders': orders
         })
         return context
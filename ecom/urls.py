@@ -11,7 +11,7 @@ urlpatterns = [
     path('contact/', views.ContactView.as_view(), name='contact'),
     path('cart/', include('cart.urls', namespace='cart')),
     path('profile/', views.ProfileView.as_view(), name='profile'),
-    path('accounts/', include('allauth.urls')),
+    path('accounts/', include('allauth.account.urls')),
     path('staff/', include('staff.urls', namespace='staff')),
 
 ]
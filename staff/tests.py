@@ -1,28 +1,32 @@
+import datetime
+
 from django.contrib.auth.models import User
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from cart.models import Order, Product, Category, ColourVariation, SizeVariation
+from cart.models import Order, OrderItem, Product, Category, ColourVariation, SizeVariation
+from core.testing import QueryCountTestMixin, make_image
 from staff.forms import ProductForm
 
 
-class SetUpTests(TestCase):
-    dummy_image = SimpleUploadedFile(
-        name='dom.jpg',
-        content=open('media/dom.jpg', 'rb').read(),
-        content_type='image/jpeg'
-    )
+class SetUpTests(QueryCountTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword', is_staff=False)
+        cls.staff_user = User.objects.create_user(username='staffuser', password='staffpassword', is_staff=True)
+        cls.category = Category.objects.create(name='Test Category')
+        cls.product1, cls.product2 = Product.objects.bulk_create([
+            Product(title='Product 1', slug='product-1', image=make_image('dom.jpg'), primary_category=cls.category,
+                    price=100, stock=10),
+            Product(title='Product 2', slug='product-2', image=make_image('dom.jpg'), primary_category=cls.category,
+                    price=200, stock=5),
+        ], batch_size=100)
 
     def setUp(self):
         self.client = Client()
-        self.user = User.objects.create_user(username='testuser', password='testpassword', is_staff=False)
-        self.staff_user = User.objects.create_user(username='staffuser', password='staffpassword', is_staff=True)
-        self.category = Category.objects.create(name='Test Category')
-        self.product1 = Product.objects.create(title='Product 1', image=self.dummy_image,
-                                               primary_category=self.category, price=100, stock=10)
-        self.product2 = Product.objects.create(title='Product 2', image=self.dummy_image,
-                                               primary_category=self.category, price=200, stock=5)
 
 
 class StaffViewTest(SetUpTests):
@@ -35,8 +39,10 @@ class StaffViewTest(SetUpTests):
         self.assertRedirects(response, reverse('home'))
 
     def test_staff_view_access_for_staff_user(self):
-        order1 = Order.objects.create(user=self.staff_user, ordered=True)
-        order2 = Order.objects.create(user=self.staff_user, ordered=True)
+        order1, order2 = Order.objects.bulk_create([
+            Order(user=self.staff_user, ordered=True),
+            Order(user=self.staff_user, ordered=True),
+        ])
         self.client.login(username='staffuser', password='staffpassword')
         url = reverse('staff:staff')
         response = self.client.get(url)
@@ -46,6 +52,73 @@ class StaffViewTest(SetUpTests):
         orders_in_context = response.context['orders']
         self.assertEqual(list(orders_in_context), [order1, order2])
 
+    def test_staff_view_pages_with_after_cursor(self):
+        now = timezone.now()
+        orders = Order.objects.bulk_create([
+            Order(user=self.staff_user, ordered=True, ordered_date=now - datetime.timedelta(minutes=min(i, 18)))
+            for i in range(25)
+        ])
+        self.client.login(username='staffuser', password='staffpassword')
+        url = reverse('staff:staff')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'] and 'FROM "cart_order" ' in q['sql']])
+        self.assertEqual(list(response.context['orders']), orders[:20])
+        self.assertEqual(response.context['next_after'], orders[19].pk)
+        response = self.client.get(url, {'after': response.context['next_after']})
+        self.assertEqual(list(response.context['orders']), orders[20:])
+        self.assertIsNone(response.context['next_after'])
+
+    def test_staff_view_cursor_pages_through_undated_orders(self):
+        now = timezone.now()
+        orders = Order.objects.bulk_create(
+            [Order(user=self.staff_user, ordered=True, ordered_date=now - datetime.timedelta(minutes=i))
+             for i in range(10)]
+            + [Order(user=self.staff_user, ordered=True) for _ in range(25)]
+        )
+        self.client.login(username='staffuser', password='staffpassword')
+        url = reverse('staff:staff')
+        seen = []
+        after = None
+        while True:
+            response = self.client.get(url, {'after': after} if after else {})
+            seen += response.context['orders']
+            after = response.context['next_after']
+            if after is None:
+                break
+        self.assertEqual(seen, orders)
+
+    def test_staff_view_unknown_cursor_returns_404(self):
+        self.client.login(username='staffuser', password='staffpassword')
+        url = reverse('staff:staff')
+        self.assertEqual(self.client.get(url, {'after': 'abc'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'after': '999'}).status_code, 404)
+
+    def test_staff_view_page_links_still_paginate(self):
+        orders = Order.objects.bulk_create([Order(user=self.staff_user, ordered=True) for _ in range(25)])
+        self.client.login(username='staffuser', password='staffpassword')
+        response = self.client.get(reverse('staff:staff'), {'page': 2})
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(list(response.context['orders']), orders[20:])
+
+    def test_query_count_does_not_grow_with_orders(self):
+        colour = ColourVariation.objects.create(name='White')
+        size = SizeVariation.objects.create(name='Medium')
+
+        def create_order():
+            order = Order.objects.create(user=self.user, ordered=True)
+            OrderItem.objects.create(order=order, product=self.product1, colour=colour, size=size, quantity=1)
+            OrderItem.objects.create(order=order, product=self.product2, colour=colour, size=size, quantity=2)
+
+        def add_orders():
+            for _ in range(3):
+                create_order()
+
+        create_order()
+        self.client.login(username='staffuser', password='staffpassword')
+        response = self.assertQueryCountDoesNotGrow(reverse('staff:staff'), add_orders)
+        self.assertEqual(len(response.context['orders']), 4)
+
 
 class ProductListViewTest(SetUpTests):
     def test_product_list_view_access_for_no_staff_user(self):
@@ -65,6 +138,24 @@ class ProductListViewTest(SetUpTests):
         products_in_context = response.context['products']
         self.assertEqual(list(products_in_context), [self.product1, self.product2])
 
+    def test_query_count_does_not_grow_with_products(self):
+        colour = ColourVariation.objects.create(name='White')
+        size = SizeVariation.objects.create(name='Medium')
+        self.product1.available_colours.add(colour)
+        self.product1.available_sizes.add(size)
+        self.client.login(username='staffuser', password='staffpassword')
+
+        def add_products():
+            products = Product.objects.bulk_create([
+                Product(title=f'Product {i}', slug=f'product-{i}', primary_category=self.category, price=100, stock=1)
+                for i in range(3, 51)
+            ])
+            colour.product_set.add(*products)
+            size.product_set.add(*products)
+
+        response = self.assertQueryCountDoesNotGrow(reverse('staff:product-list'), add_products)
+        self.assertEqual(len(response.context['products']), 20)
+
 
 class ProductDeleteViewTest(SetUpTests):
     def test_product_delete_view_access_for_no_staff_user(self):
@@ -120,6 +211,39 @@ class ProductUpdateViewTest(SetUpTests):
         self.assertIn(size, self.product1.available_sizes.all())
         self.assertRedirects(response, reverse('staff:product-list'))
 
+    def test_product_update_view_query_count_does_not_grow_with_variations(self):
+        self.client.login(username='staffuser', password='staffpassword')
+        self.product1.available_colours.add(ColourVariation.objects.create(name='White'))
+        self.product1.available_sizes.add(SizeVariation.objects.create(name='Medium'))
+
+        def add_variations():
+            colours = ColourVariation.objects.bulk_create([ColourVariation(name=f'Colour {i}') for i in range(5)])
+            sizes = SizeVariation.objects.bulk_create([SizeVariation(name=f'Size {i}') for i in range(5)])
+            self.product1.available_colours.add(*colours)
+            self.product1.available_sizes.add(*sizes)
+
+        url = reverse('staff:product-update', kwargs={'pk': self.product1.pk})
+        response = self.assertQueryCountDoesNotGrow(url, add_variations)
+        self.assertEqual(len(response.context['form'].initial['available_colours']), 6)
+
+    def test_product_update_view_post_saves_product_once(self):
+        self.client.login(username='staffuser', password='staffpassword')
+        colour = ColourVariation.objects.create(name='White')
+        size = SizeVariation.objects.create(name='Medium')
+        url = reverse('staff:product-update', kwargs={'pk': self.product1.pk})
+        updated_data = {
+            'title': 'Updated Product',
+            'description': 'Hello there',
+            'price': 20,
+            'available_colours': [colour.pk],
+            'available_sizes': [size.pk],
+            'primary_category': self.category.pk
+        }
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, data=updated_data)
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "cart_product"')]
+        self.assertEqual(len(updates), 1)
+
 
 class ProductCreateViewTest(SetUpTests):
 
@@ -1,62 +1,89 @@
+import logging
+
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse
+from django.db.models import F, Q
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse_lazy
 from django.views import generic
 
 from cart.models import Order, Product
 from staff.forms import ProductForm
 from staff.mixins import StaffUserMixin
 
+logger = logging.getLogger(__name__)
+
 
 # Create your views here.
 class StaffView(LoginRequiredMixin, StaffUserMixin, generic.ListView):
     template_name = 'staff/staff.html'
-    queryset = Order.objects.filter(ordered=True).order_by('-ordered_date')
+    queryset = Order.objects.with_totals().select_related(
+        'user', 'billing_address', 'shipping_address'
+    ).filter(ordered=True).order_by(F('ordered_date').desc(nulls_last=True), 'pk')
     paginate_by = 20
     context_object_name = 'orders'
 
+    def get_queryset(self):
+        queryset = super(StaffView, self).get_queryset()
+        after = self.request.GET.get('after')
+        if after is None:
+            return queryset
+        if not after.isdigit():
+            raise Http404
+        cursor = get_object_or_404(Order.objects.only('ordered_date'), pk=after, ordered=True)
+        if cursor.ordered_date is None:
+            return queryset.filter(ordered_date__isnull=True, pk__gt=cursor.pk)
+        return queryset.filter(
+            Q(ordered_date__lt=cursor.ordered_date)
+            | Q(ordered_date=cursor.ordered_date, pk__gt=cursor.pk)
+            | Q(ordered_date__isnull=True)
+        )
+
+    def get_paginate_by(self, queryset):
+        # ?page= links keep OFFSET pagination; everything else pages with the ?after= cursor
+        return self.paginate_by if 'page' in self.request.GET else None
+
+    def get_context_data(self, **kwargs):
+        if self.get_paginate_by(self.object_list) is not None:
+            return super(StaffView, self).get_context_data(**kwargs)
+        orders = list(self.object_list[:self.paginate_by + 1])
+        next_after = orders[self.paginate_by - 1].pk if len(orders) > self.paginate_by else None
+        return super(StaffView, self).get_context_data(
+            object_list=orders[:self.paginate_by], next_after=next_after, **kwargs)
+
 
 class ProductListView(LoginRequiredMixin, StaffUserMixin, generic.ListView):
     template_name = 'staff/product_list.html'
-    queryset = Product.objects.all()
+    queryset = Product.objects.defer('description').select_related('primary_category').prefetch_related(
+        'available_colours', 'available_sizes')
     paginate_by = 20
     context_object_name = 'products'
 
 
 class ProductDeleteView(LoginRequiredMixin, StaffUserMixin, generic.DeleteView):
     template_name = 'staff/product_delete.html'
+    success_url = reverse_lazy('staff:product-list')
 
     def get_queryset(self):
-        queryset = Product.objects.all()
+        queryset = Product.objects.only('id', 'title')
         return queryset
 
-    def get_success_url(self):
-        return reverse('staff:product-list')
-
 
 class ProductUpdateView(LoginRequiredMixin, StaffUserMixin, generic.UpdateView):
     template_name = 'staff/product_update.html'
+    success_url = reverse_lazy('staff:product-list')
     form_class = ProductForm
 
     def get_queryset(self):
         queryset = Product.objects.all()
         return queryset
 
-    def form_valid(self, form):
-        form.save()
-        return super(ProductUpdateView, self).form_valid(form)
-
-    def get_success_url(self):
-        return reverse('staff:product-list')
-
 
 class ProductCreateView(LoginRequiredMixin, StaffUserMixin, generic.CreateView):
     template_name = 'staff/product_create.html'
+    success_url = reverse_lazy('staff:product-list')
     form_class = ProductForm
 
-    def get_success_url(self):
-        return reverse('staff:product-list')
-
     def form_valid(self, form):
-        form.save()
-        print(form.cleaned_data['title'])
+        logger.debug("Created product: %s", form.cleaned_data['title'])
         return super(ProductCreateView, self).form_valid(form)